@@ -1,4 +1,3 @@
-import copy
 from typing import List
 
 from gym import spaces
@@ -22,29 +21,64 @@ class Connect4Env(MultiAgentEnv):
         super().__init__()
         self.bandit = bandit
         self.game = Connect4(env_config)
-        self.action_space = spaces.Discrete(self.game.board_width + 1)
-        self.observation_space = spaces.Dict({
-            'action_mask': spaces.Box(low=0, high=1, shape=(self.game.board_width + 1,), dtype=np.uint8),
-            'board': spaces.Box(low=0, high=2, shape=(self.game.board_height, self.game.board_width), dtype=np.uint8),
+        self.observation_space, self.action_space = self.get_spaces(env_config)
+        # maintain a copy of each player's observations, stored top-row-first so
+        # no flip or copy is needed when they are observed
+        # each board is player invariant, has the player as `1` and the opponent as `2`
+        self.boards: List[np.array] = [
+            np.zeros((self.game.board_height, self.game.board_width), dtype=np.uint8) for _ in range(2)]
+        # numpy mirror of the game's column heights plus persistent mask buffers,
+        # so the action mask is a single vectorised compare instead of a list build
+        self._lowest_row_np = np.zeros(self.game.board_width, dtype=np.uint8)
+        self._mask_buf = np.zeros(self.game.board_width + 1, dtype=np.uint8)
+        self._mask_view = self._mask_buf[:-1].view(bool)  # np.less needs a bool output
+        self._pass_mask = np.zeros(self.game.board_width + 1, dtype=np.uint8)
+        self._pass_mask[-1] = 1
+        # persistent observation dicts, reset()/step() mutate the arrays in
+        # place; RLlib copies observations into its rollout buffers, so
+        # sharing the same objects across steps is safe and cuts the per-step
+        # dict and array churn to zero
+        self._current_player = np.zeros(1, dtype=np.uint8)
+        self._obs = {
+            i: {
+                'action_mask': self._pass_mask,  # reassigned every step
+                'board': self.boards[i],
+                'current_player': self._current_player,
+                'player_id': np.array([i], dtype=np.uint8),
+            } for i in range(2)
+        }
+
+    @classmethod
+    def get_spaces(cls, env_config=None):
+        """Build the observation and action spaces without building an env.
+
+        Driver scripts only need the spaces to assemble policy configs, so
+        this skips allocating the full environment's board buffers.
+
+        :param env_config: An optional environment configuration.
+        :return: A tuple of the observation space and the action space.
+        """
+        config = env_config or {}
+        board_height = config.get('board_height', BOARD_HEIGHT)
+        board_width = config.get('board_width', BOARD_WIDTH)
+        observation_space = spaces.Dict({
+            'action_mask': spaces.Box(low=0, high=1, shape=(board_width + 1,), dtype=np.uint8),
+            'board': spaces.Box(low=0, high=2, shape=(board_height, board_width), dtype=np.uint8),
             'current_player': spaces.Box(low=0, high=1, shape=(1,), dtype=np.uint8),
             'player_id': spaces.Box(low=0, high=1, shape=(1,), dtype=np.uint8),
         })
-        # maintain a copy of each player's observations
-        # each board is player invariant, has the player as `1` and the opponent as `2`
-        self.boards: List[np.array] = []
+        action_space = spaces.Discrete(board_width + 1)
+        return observation_space, action_space
 
     def reset(self):
-        self.game = Connect4(self.game.env_config)
-        self.boards = [np.zeros((self.game.board_height, self.game.board_width), dtype=np.uint8) for _ in range(2)]
-        obs_dict = {
-            i: {
-                'action_mask': self.get_action_mask(i),
-                'board': self.get_state(i),
-                'current_player': np.array([0]),  # player0 is always first
-                'player_id': np.array([i]),
-            } for i in range(2)
-        }
-        return obs_dict
+        self.game.reset()
+        for board in self.boards:
+            board.fill(0)
+        self._lowest_row_np.fill(0)
+        self._current_player[0] = 0  # player0 is always first
+        for i in range(2):
+            self._obs[i]['action_mask'] = self.get_action_mask(i)
+        return self._obs
 
     def step(self, action_dict):
         """Make a game action.
@@ -67,42 +101,43 @@ class Connect4Env(MultiAgentEnv):
             raise e
 
         self.game.move(column)
-        self.boards[0][self.game.column_counts[column] - 1][column] = self.game.player + 1
-        self.boards[1][self.game.column_counts[column] - 1][column] = (self.game.player ^ 1) + 1
-
-        obs = {
-            i: {
-                'board': self.get_state(i),
-                'action_mask': self.get_action_mask(i),
-                'player_id': np.array([i]),
-                'current_player': np.array([next_player]),
-            } for i in range(2)
-        }
+        self._lowest_row_np[column] += 1
+        row = self.game.board_height - self.game.lowest_row[column]  # board buffers are stored pre-flipped
+        self.boards[0][row][column] = self.game.player + 1
+        self.boards[1][row][column] = (self.game.player ^ 1) + 1
+
+        self._current_player[0] = next_player
+        for i in range(2):
+            self._obs[i]['action_mask'] = self.get_action_mask(i)
+        obs = self._obs
+        reward, done = self.game.evaluate(player)
+        if reward == self.game.reward_win:
+            next_reward = self.game.reward_lose
+        elif reward == self.game.reward_lose:
+            next_reward = self.game.reward_win
+        else:
+            next_reward = reward  # draw and step rewards are shared
         rewards = {
-            player: self.game.get_reward(player),
-            next_player: self.game.get_reward(next_player)
+            player: reward,
+            next_player: next_reward,
         }
-        game_over = {'__all__': self.game.is_game_over()}
+        game_over = {'__all__': done}
 
         return obs, rewards, game_over, {}
 
     def get_state(self, player=None) -> np.ndarray:
-        if player == 0 or None:
-            board = self.boards[0].copy()
+        if player == 0:
+            return self.boards[0]
         elif player == 1:
-            board = self.boards[1].copy()
+            return self.boards[1]
         else:
             raise ValueError('Invalid player ID %s' % player)
-        state = np.flip(board, axis=0)
-        return state
 
     def get_action_mask(self, player):
         if player == self.game.player ^ 1:
-            mask = np.array(self.game.get_action_mask() + [0])
-        else:
-            mask = np.zeros((8,), dtype=np.uint8)
-            mask[-1] = 1
-        return mask
+            np.less(self._lowest_row_np, self.game.board_height, out=self._mask_view)
+            return self._mask_buf
+        return self._pass_mask
 
     @property
     def reward_win(self):
@@ -118,7 +153,14 @@ class Connect4Env(MultiAgentEnv):
 
 
 class Connect4:
-    def __init__(self, env_config=None, game_state=None) -> None:
+    """Connect4 game engine on a pair of machine-word bitboards.
+
+    Each player's discs live in a single integer using the standard 7x7
+    bit layout (one padding bit above each column), so moves and win checks
+    are plain shift/mask operations on two words rather than grid walks.
+    """
+
+    def __init__(self, env_config=None) -> None:
         super().__init__()
         self.env_config = dict({
             'board_height': BOARD_HEIGHT,
@@ -129,48 +171,113 @@ class Connect4:
             'reward_lose': REWARD_LOSE,
             'reward_step': REWARD_STEP,
         }, **env_config or {})
+        # plain attributes instead of properties, move/is_winner read these on
+        # every call and a property costs a descriptor call plus dict lookup
+        self.board_height = self.env_config['board_height']
+        self.board_width = self.env_config['board_width']
+        self.win_length = self.env_config['win_length']
+        self.reward_win = self.env_config['reward_win']
+        self.reward_draw = self.env_config['reward_draw']
+        self.reward_lose = self.env_config['reward_lose']
+        self.reward_step = self.env_config['reward_step']
         self.player = 1  # players: [0, 1]
-        self.bitboard = [0, 0]  # bitboard for each player
+        self.bit_board = [0, 0]  # bitboard for each player
         # the four different win condition directions to bitshift over:
         #   - (vertical, horizontal, diagonal-descending, diagonal-ascending)
-        self.win_conditions = [1, (self.board_height + 1), (self.board_height + 1) - 1, (self.board_height + 1) + 1]
-        # index of the bottom empty space for each column
-        self.empty_indexes = [(self.board_height + 1) * i for i in range(self.board_width)]
-        # number of discs in each column
-        self.column_counts = [0] * self.board_width
+        self.dirs = (1, (self.board_height + 1), (self.board_height + 1) - 1, (self.board_height + 1) + 1)
+        # bit index of the bottom empty space for each column
+        self.heights = [(self.board_height + 1) * i for i in range(self.board_width)]
+        # number of discs in each column, i.e. the lowest empty row
+        self.lowest_row = [0] * self.board_width
         # to check for valid moves it is convenient to build an index of the top row of the board to compare against
         self.top_row = [(x * (self.board_height + 1)) - 1 for x in range(1, self.board_width + 1)]
+        # empty-board column heights, kept so reset() can skip re-deriving them
+        self._initial_heights = tuple(self.heights)
+        # legal moves only change on move(), so cache them between calls
+        self._moves_cache = None
+
+    @classmethod
+    def from_board(cls, board, player, env_config=None) -> 'Connect4':
+        """Reconstitute a game from a bottom-row-first board array.
 
-        if game_state is not None:  # reconstitute from game state
-            self.player = game_state['player']
-            for y, row in enumerate(game_state['board']):
-                num_updated = 0
-                for column, value in enumerate(row):
-                    if value in {1, 2}:
-                        player = value - 1
-                        m2 = 1 << self.empty_indexes[column]
-                        self.empty_indexes[column] += 1
-                        self.bitboard[player] ^= m2
-                        self.column_counts[column] += 1
-                        num_updated += 1
-                if num_updated == 0:
-                    break
+        Iterates the board once, setting bits and column heights directly, so
+        rebuilding a mid-game position is a single pass with no move replay.
+
+        :param board: An (H, W) array with rows bottom-first, `1`/`2` discs.
+        :param player: The player who made the last move.
+        :return: A Connect4 positioned at the given board.
+        """
+        game = cls(env_config)
+        game.player = player
+        bit_board = game.bit_board
+        heights = game.heights
+        lowest_row = game.lowest_row
+        for row in board:
+            num_updated = 0
+            for column, value in enumerate(row):
+                if value == 1 or value == 2:
+                    bit_board[value - 1] ^= 1 << heights[column]
+                    heights[column] += 1
+                    lowest_row[column] += 1
+                    num_updated += 1
+            if num_updated == 0:
+                break
+        return game
+
+    def reset(self) -> None:
+        """Reset to an empty board without re-merging the config in __init__."""
+        self.player = 1
+        self.bit_board = [0, 0]
+        self.heights = list(self._initial_heights)
+        self.lowest_row = [0] * self.board_width
+        self._moves_cache = None
 
     def clone(self):
-        clone = Connect4(self.env_config)
-        clone.bitboard = copy.deepcopy(self.bitboard)
-        clone.empty_indexes = copy.deepcopy(self.empty_indexes)
-        clone.column_counts = copy.deepcopy(self.column_counts)
-        clone.top_row = copy.deepcopy(self.top_row)
-        clone.player = self.player
+        # bypass __init__ entirely, MCTS clones once per node expansion; the
+        # config scalars and read-only lookup tables are shared by reference,
+        # only the mutable position state is slice-copied
+        clone = object.__new__(Connect4)
+        clone.__dict__.update(self.__dict__)
+        clone.bit_board = self.bit_board[:]
+        clone.heights = self.heights[:]
+        clone.lowest_row = self.lowest_row[:]
         return clone
 
     def move(self, column: int) -> None:
-        m2 = 1 << self.empty_indexes[column]  # position entry on bitboard
-        self.empty_indexes[column] += 1  # update top empty row for column
-        self.player ^= 1
-        self.bitboard[self.player] ^= m2  # XOR operation to insert token in player's bitboard
-        self.column_counts[column] += 1  # update number of tokens in column
+        heights = self.heights
+        m2 = 1 << heights[column]  # position entry on bitboard
+        heights[column] += 1  # update top empty row for column
+        player = self.player ^ 1
+        self.player = player
+        self.bit_board[player] ^= m2  # XOR operation to insert token in player's bitboard
+        self.lowest_row[column] += 1  # update number of tokens in column
+        self._moves_cache = None
+
+    def evaluate(self, player=None):
+        """Compute the reward for `player` and whether the game is over.
+
+        Fuses `get_reward` and `is_game_over` so a step costs at most two win
+        checks and one short-circuiting moves test, instead of separate calls
+        re-running the win checks and building full move lists.
+
+        :param player: The player to evaluate, defaults to the current player.
+        :return: A tuple of the player's reward and whether the game is over.
+        """
+        if player is None:
+            player = self.player
+
+        if self.is_winner(player):
+            return self.reward_win, True
+        elif self.is_winner(player ^ 1):
+            return self.reward_lose, True
+        elif not self._any_moves_left():
+            return self.reward_draw, True
+        else:
+            return self.reward_step, False
+
+    def _any_moves_left(self) -> bool:
+        board_height = self.board_height
+        return any(row < board_height for row in self.lowest_row)
 
     def get_reward(self, player=None) -> float:
         if player is None:
@@ -188,17 +295,33 @@ class Connect4:
     def is_winner(self, player=None) -> bool:
         """Evaluate board, find out if a player has won.
 
+        Uses the two-shift fold for the standard win length of four: folding
+        the bitboard onto itself twice leaves a bit set only where four discs
+        line up, costing two shifts and two ANDs per direction.
+
         :param player: The player to check.
         :return: True if the player has won, otherwise False.
         """
         if player is None:
             player = self.player
 
-        for direction in self.win_conditions:
-            bb = self.bitboard[player]
-            for i in range(1, self.win_length):
-                bb &= self.bitboard[player] >> (i * direction)
-            if bb != 0:
+        # pre-bind locals, attribute lookups add up over tens of thousands of
+        # win checks per MCTS decision
+        bb = self.bit_board[player]
+        if self.win_length == 4:
+            for direction in self.dirs:
+                m = bb & (bb >> direction)
+                if m & (m >> (2 * direction)):
+                    return True
+            return False
+
+        # generic fallback for non-standard win lengths
+        win_length = self.win_length
+        for direction in self.dirs:
+            m = bb
+            for i in range(1, win_length):
+                m &= bb >> (i * direction)
+            if m != 0:
                 return True
         return False
 
@@ -219,15 +342,19 @@ class Connect4:
     def get_moves(self) -> List[int]:
         """Get a list of available moves.
 
+        The result is memoized until the next move is made, so callers must
+        treat the returned list as read-only.
+
         :return: A list of action indexes.
         """
-        if self.is_winner(self.player) or self.is_winner(self.player ^ 1):
-            return []  # if terminal state, return empty list
-
-        list_moves = []
-        for i in range(self.board_width):
-            if self.column_counts[i] < self.board_height:
-                list_moves.append(i)
+        list_moves = self._moves_cache
+        if list_moves is None:
+            if self.is_winner(self.player) or self.is_winner(self.player ^ 1):
+                list_moves = []  # if terminal state, return empty list
+            else:
+                board_height = self.board_height
+                list_moves = [i for i in range(self.board_width) if self.lowest_row[i] < board_height]
+            self._moves_cache = list_moves
         return list_moves
 
     def get_action_mask(self) -> List[int]:
@@ -235,7 +362,7 @@ class Connect4:
 
         :return: A list of ints where 1 if valid move else 0.
         """
-        return [1 if self.column_counts[i] < self.board_height else 0 for i in range(self.board_width)]
+        return [1 if self.lowest_row[i] < self.board_height else 0 for i in range(self.board_width)]
 
     def is_valid_move(self, column: int) -> bool:
         """Check if column is full.
@@ -243,32 +370,4 @@ class Connect4:
         :param column: The column to check
         :return: True if it is a valid move, else False.
         """
-        return self.empty_indexes[column] != self.top_row[column]
-
-    @property
-    def board_height(self) -> int:
-        return self.env_config['board_height']
-
-    @property
-    def board_width(self) -> int:
-        return self.env_config['board_width']
-
-    @property
-    def win_length(self) -> int:
-        return self.env_config['win_length']
-
-    @property
-    def reward_win(self) -> float:
-        return self.env_config['reward_win']
-
-    @property
-    def reward_draw(self) -> float:
-        return self.env_config['reward_draw']
-
-    @property
-    def reward_lose(self) -> float:
-        return self.env_config['reward_lose']
-
-    @property
-    def reward_step(self) -> float:
-        return self.env_config['reward_step']
+        return self.heights[column] != self.top_row[column]
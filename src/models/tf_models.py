@@ -25,7 +25,9 @@ class MaskedActionsMLP(DistributionalQModel, TFModelV2):
 
     def forward(self, input_dict, state, seq_lens):
         obs = flatten(input_dict['obs']['board'])
-        action_mask = tf.maximum(tf.log(input_dict['obs']['action_mask']), tf.float32.min)
+        # the {0, 1} mask maps to a {-1e9, 0} logit penalty with one cast and
+        # one multiply, avoiding the log(0) -> -inf then clamp round trip
+        action_mask = (tf.cast(input_dict['obs']['action_mask'], tf.float32) - 1.0) * 1e9
         model_out, _ = self.mlp({'obs': obs})
         return action_mask + model_out, state
 
@@ -93,7 +95,7 @@ class MaskedActionsCNN(DistributionalQModel, TFModelV2):
             obs = tf.expand_dims(tf.pad(obs, paddings, mode='CONSTANT', constant_values=3), -1)
         else:
             obs = flatten(obs)
-        action_mask = tf.maximum(tf.log(input_dict['obs']['action_mask']), tf.float32.min)
+        action_mask = (tf.cast(input_dict['obs']['action_mask'], tf.float32) - 1.0) * 1e9
         model_out, self._value_out = self.base_model(obs)
         return action_mask + model_out, state
 
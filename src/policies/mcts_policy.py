@@ -1,3 +1,4 @@
+import math
 import random
 import time
 
@@ -52,24 +53,33 @@ class MCTSPolicy(Policy):
                 {"f1": [BATCH_SIZE, ...], "f2": [BATCH_SIZE, ...]}.
         """
 
-        actions = []
+        actions = [self.num_actions] * len(obs_batch)  # default to the "pass" action
+        searches = []  # (batch index, game) pairs for the obs where it is our turn
         board_end = self.board_start + self.board_len
-        for obs in obs_batch:
+        for n, obs in enumerate(obs_batch):
             action_mask, board = obs[:self.board_start], obs[self.board_start:board_end]
             current_player, player_id = obs[board_end:board_end + 1].item(), obs[board_end + 1:].item()
             if current_player == player_id:
-                board = np.flip(board.reshape(self.board_shape), axis=0).astype(np.uint8)
+                # a reversed view hands from_board the bottom-first rows it
+                # wants without materialising a flipped copy
+                board = board.reshape(self.board_shape)[::-1].astype(np.uint8, copy=False)
                 if self.board_shape == (7, 7):  # if square obs, cut off the filler `3`s at the top
                     board = board[1:]
-                game = Connect4(game_state={'board': board, 'player': 1})
-                action, metrics = mcts(game, self.max_rollouts, self.rollouts_timeout)
-                actions.append(action)
-                self.metrics['num_rollouts'].append(metrics['num_rollouts'])
-            else:
-                actions.append(self.num_actions)  # "pass" action
+                searches.append((n, Connect4.from_board(board, player=1)))
+
+        # the searches are independent but pure-Python, so threading them
+        # only adds GIL contention; batch parallelism comes from running
+        # many rollout workers instead
+        results = map(self._search, (game for _, game in searches))
+        for (n, _), (action, metrics) in zip(searches, results):
+            actions[n] = action
+            self.metrics['num_rollouts'].append(metrics['num_rollouts'])
 
         return np.array(actions), state_batches, {}
 
+    def _search(self, game):
+        return mcts(game, self.max_rollouts, self.rollouts_timeout)
+
     def learn_on_batch(self, samples):
         pass
 
@@ -84,73 +94,149 @@ class MCTSPolicy(Policy):
 
 
 def mcts(current_state: Connect4, max_rollouts, rollouts_timeout):
-    assert int(max_rollouts) > 0, 'MCTS `max_rollouts` must be a positive integer'
-    root = Node(state=current_state)
-    start = time.clock()
-    for i in range(int(max_rollouts)):
-        node = root
+    max_rollouts = int(max_rollouts)
+    assert max_rollouts > 0, 'MCTS `max_rollouts` must be a positive integer'
+    tree = SearchTree(current_state, max_rollouts)
+    start = time.perf_counter()
+    for i in range(max_rollouts):
+        node = 0  # root
         state = current_state.clone()
 
         # selection
         # keep going down the tree based on best UCT values until terminal or unexpanded node
-        while len(node.untried_moves) == 0 and len(node.children):
-            node = node.selection()
-            state.move(node.move)
+        while tree.is_fully_expanded(node):
+            node = tree.selection(node)
+            state.move(tree.move[node])
 
         # expand
-        if node.untried_moves:
-            move = random.choice(node.untried_moves)
-            state.move(move)
-            node = node.expand(move, state)
+        if tree.n_children[node]:
+            node = tree.expand(node, state)
 
         # rollout
-        while state.get_moves():
-            state.move(random.choice(state.get_moves()))
+        _random_rollout(state)
 
         # backpropagate
-        while node is not None:
-            node.update(state.get_reward(node.player))
-            node = node.parent
+        while node != -1:
+            tree.update(node, state.get_reward(tree.player[node]))
+            node = tree.parent[node]
 
-        duration = time.clock() - start
-        if duration > rollouts_timeout:
+        # only sample the clock every 16 rollouts, the budget check is far
+        # cheaper than the timer call itself on short rollouts
+        if (i & 15) == 15 and time.perf_counter() - start > rollouts_timeout:
             break
 
-    def score(x):
-        return x.wins / x.visits
-
-    sorted_children = sorted(root.children, key=score)[::-1]
     metrics = {'num_rollouts': i + 1}  # "i+1" to count from 1
 
-    return sorted_children[0].move, metrics
-
-
-class Node:
-    def __init__(self, move=None, parent=None, state=None):
-        self.state = state.clone()
-        self.parent = parent
-        self.move = move
-        self.untried_moves = state.get_moves()
-        self.children = []
-        self.wins = 0
-        self.visits = 0
-        self.player = state.player
-
-    def selection(self):
-        # return child with largest UCT value
-        def uct(x):
-            return x.wins / x.visits + np.sqrt(2 * np.log(self.visits) / x.visits)
-
-        return sorted(self.children, key=uct)[-1]
-
-    def expand(self, move, state):
-        # return child when move is taken
-        # remove move from current node
-        child = Node(move=move, parent=self, state=state)
-        self.untried_moves.remove(move)
-        self.children.append(child)
-        return child
-
-    def update(self, result):
-        self.wins += result
-        self.visits += 1
+    return tree.best_move(), metrics
+
+
+def _random_rollout(state: Connect4) -> None:
+    """Play uniform random moves on `state` until the game ends.
+
+    The playout dominates MCTS wall-time, so this works on the game's
+    bitboard fields directly with everything bound to locals once: the legal
+    column list is maintained incrementally instead of rebuilt via
+    `get_moves()` twice per ply, and only the player who just moved is
+    checked for a win.
+
+    :param state: The game to play out, mutated in place.
+    """
+    bit_board = state.bit_board
+    heights = state.heights
+    lowest_row = state.lowest_row
+    board_height = state.board_height
+    is_winner = state.is_winner
+    player = state.player
+    if is_winner(player) or is_winner(player ^ 1):
+        return  # already terminal, nothing to play out
+    choice = random.choice
+    moves = [i for i in range(state.board_width) if lowest_row[i] < board_height]
+    while moves:
+        column = choice(moves)
+        heights[column] += 1
+        player ^= 1
+        bit_board[player] ^= 1 << (heights[column] - 1)
+        lowest_row[column] += 1
+        if lowest_row[column] == board_height:
+            moves.remove(column)
+        if is_winner(player):
+            break
+    state.player = player
+    state._moves_cache = None  # the board changed under the memoized moves
+
+
+class SearchTree:
+    """A flat structure-of-arrays MCTS tree.
+
+    Nodes are rows in parallel NumPy arrays rather than linked Python
+    objects, so a rollout allocates nothing. A node reserves one contiguous
+    block of child slots (one per legal move) when it is first reached,
+    which makes its siblings a slice and UCT selection a single vectorised
+    expression. No game states are stored in the tree; the search replays
+    moves on a scratch state while descending.
+    """
+
+    def __init__(self, state: Connect4, max_rollouts: int) -> None:
+        # one node is expanded per rollout and each reached node reserves at
+        # most board_width child slots, so this bound can never overflow
+        capacity = 1 + (max_rollouts + 1) * state.board_width
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.move = np.full(capacity, -1, dtype=np.int8)
+        self.player = np.zeros(capacity, dtype=np.int8)
+        self.wins = np.zeros(capacity, dtype=np.float64)
+        self.visits = np.zeros(capacity, dtype=np.int32)
+        self.first_child = np.full(capacity, -1, dtype=np.int32)
+        self.n_children = np.zeros(capacity, dtype=np.int32)
+        self.n_expanded = np.zeros(capacity, dtype=np.int32)
+        self.is_expanded = np.zeros(capacity, dtype=bool)
+        self.size = 1  # the root occupies slot 0
+        self.player[0] = state.player
+        self._add_children(0, state)
+
+    def is_fully_expanded(self, node: int) -> bool:
+        n_children = self.n_children[node]
+        return n_children > 0 and self.n_expanded[node] == n_children
+
+    def selection(self, node: int) -> int:
+        # vectorised UCT over the sibling slice; taking the argmax over the
+        # reversed slice keeps the previous preference for the last of ties
+        first = self.first_child[node]
+        last = first + self.n_children[node]
+        visits = self.visits[first:last]
+        uct = self.wins[first:last] / visits + np.sqrt(2 * math.log(self.visits[node]) / visits)
+        return last - 1 - int(np.argmax(uct[::-1]))
+
+    def expand(self, node: int, state: Connect4) -> int:
+        # pick a random untried child, apply its move to the scratch state
+        # and reserve the child's own block of slots
+        first = self.first_child[node]
+        last = first + self.n_children[node]
+        untried = [slot for slot in range(first, last) if not self.is_expanded[slot]]
+        slot = random.choice(untried)
+        state.move(self.move[slot])
+        self.is_expanded[slot] = True
+        self.n_expanded[node] += 1
+        self._add_children(slot, state)
+        return slot
+
+    def update(self, node: int, reward: float) -> None:
+        self.wins[node] += reward
+        self.visits[node] += 1
+
+    def best_move(self) -> int:
+        first = self.first_child[0]
+        last = first + self.n_children[0]
+        scores = self.wins[first:last] / self.visits[first:last]
+        return int(self.move[last - 1 - int(np.argmax(scores[::-1]))])
+
+    def _add_children(self, node: int, state: Connect4) -> None:
+        moves = state.get_moves()
+        if not moves:
+            return  # terminal node
+        first = self.size
+        self.size = first + len(moves)
+        self.first_child[node] = first
+        self.n_children[node] = len(moves)
+        self.move[first:self.size] = moves
+        self.parent[first:self.size] = node
+        self.player[first:self.size] = state.player ^ 1
@@ -1,5 +1,7 @@
 """A collection of training utilities."""
 
+import math
+
 from ray.rllib.models import ModelCatalog
 
 from src.envs import Connect4Env
@@ -7,6 +9,9 @@ from src.models import MaskedActionsMLP, MaskedActionsCNN
 from src.policies import MCTSPolicy
 
 
+# precomputed Elo constant, 10 ** (x / 400) == exp(x * log(10) / 400)
+_ELO_SCALE = math.log(10) / 400
+
 def get_worker_config(args):
     """When debugging use a single worker otherwise app is too slow and hard to debug.
 
@@ -30,7 +35,11 @@ def get_worker_config(args):
         return {
             'num_workers': 20,
             'num_gpus': 1,
+            # vectorise envs in-process; Connect4 steps are far cheaper than a
+            # Ray actor round trip, so `remote_worker_envs` doesn't pay here
             'num_envs_per_worker': 32,
+            # 'remote_worker_envs': True,
+            # 'remote_env_batch_wait_ms': 0,
             'train_batch_size': 65536,
             'sgd_minibatch_size': 4096,
             'num_sgd_iter': 6,
@@ -45,6 +54,7 @@ def get_worker_config(args):
         return {
             'num_workers': 0,
             'num_gpus': 1,
+            'num_envs_per_worker': 8,
         }
 
 
@@ -181,4 +191,4 @@ class EloRater:
 
     @staticmethod
     def win_probability(rating1, rating2):
-        return (1 + 10 ** ((rating1 - rating2) / 400)) ** -1
+        return 1.0 / (1.0 + math.exp((rating1 - rating2) * _ELO_SCALE))
@@ -1,7 +1,7 @@
 import argparse
-import math
-import random
+import os
 
+import numpy as np
 import ray
 from ray import tune
 from ray.tune.registry import register_env
@@ -11,6 +11,110 @@ from src.policies import HumanPolicy, RandomPolicy
 from src.utils import get_worker_config, get_model_config, get_learner_policy_configs, get_mcts_policy_configs
 
 
+# policy name snapshots, assigned in __main__ before tune.run; keeping the
+# callbacks below at module scope means cloudpickle ships them with these
+# small tuples instead of closures dragging the full policy-spec dicts along
+TRAINABLE_KEYS = ()
+MCTS_TRAIN_KEYS = ()
+MCTS_EVAL_KEYS = ()
+TRIAL_PREFIX = ''
+ENV_CLS = None
+# numpy's C-level PRNG; created lazily on first use because cloudpickle
+# ships this module's functions by value -- a pre-built RandomState would be
+# captured with its state and replayed identically on every rollout worker
+_rng = None
+
+
+def c4_env_creator(env_config):
+    # a module-level creator pickles as a plain function reference, where a
+    # lambda closing over env_cls would drag its closure to every worker
+    return ENV_CLS(env_config)
+
+# built once so repeated tune.run invocations share the same criteria dict;
+# this version of tune only accepts the dict form, not Stopper objects
+STOP_CRITERIA = {
+    # 'timesteps_total': int(10e6),
+    # 'timesteps_total': int(100e6),
+    # 'timesteps_total': int(1e9),
+    # 'policy_reward_mean/learned00': 0.6
+    'policy_reward_mean/learned00': 0.0
+}
+
+
+def on_episode_start(info):
+    # share the immutable tuples, the mapping fns only sample from them
+    # so there's no need to allocate fresh lists every episode
+    user_data = info['episode'].user_data
+    user_data['trainable_policies'] = TRAINABLE_KEYS
+    user_data['mcts_policies'] = MCTS_EVAL_KEYS
+
+
+def name_trial(trial):
+    """Give trials a more readable name in terminal & Tensorboard."""
+    return TRIAL_PREFIX + trial.trainable_name
+
+
+# last few episode assignments, keyed by episode id; the mapping fn can be
+# called once per agent rather than once per episode, so both calls for an
+# episode must agree and the PRNG should only be drawn once
+_ep_assignments = {}
+
+
+def mcts_opponent_policy_mapping_fn(info):
+    global _rng
+    if _rng is None:
+        _rng = np.random.RandomState()  # seeded from OS entropy per process
+    episode_id = info['episode_id']
+    pair = _ep_assignments.get(episode_id)
+    if pair is None:
+        # a single coin flip orders the pair, shuffling a 2-element list is
+        # the same distribution with far more machinery per call
+        learner = TRAINABLE_KEYS[_rng.randint(len(TRAINABLE_KEYS))]
+        mcts = MCTS_TRAIN_KEYS[0]  # only one MCTS training opponent today
+        pair = (learner, mcts) if _rng.randint(2) else (mcts, learner)
+        if len(_ep_assignments) > 4096:
+            _ep_assignments.clear()  # keep the per-worker cache bounded
+        _ep_assignments[episode_id] = pair
+    return pair
+
+
+def build_config(args, tune_config, policies):
+    """Assemble the trial config once per launch.
+
+    :param args: Command line arguments.
+    :param tune_config: The worker configuration from `get_worker_config`.
+    :param policies: The merged policy spec dict.
+    :return: The config dict for `tune.run`.
+    """
+    return dict({
+        'env': 'c4',
+        'env_config': {},
+        # 'lr': 0.001,
+        'lr': 5e-5,
+        # 'gamma': 0.995,
+        'gamma': 0.9,
+        'clip_param': 0.2,
+        'lambda': 0.95,
+        # 'kl_coeff': 1.0,
+        'entropy_coeff': 0.01,
+        'multiagent': {
+            # a frozenset makes RLlib's per-batch "should this policy
+            # train" membership tests O(1) instead of a list scan
+            'policies_to_train': frozenset(TRAINABLE_KEYS),
+            # 'policy_mapping_fn': random_policy_mapping_fn if args.num_learners > 1 else lambda _: ('learned00', 'learned00'),
+            'policy_mapping_fn': mcts_opponent_policy_mapping_fn,
+            'policies': policies,
+        },
+        'callbacks': {
+            'on_episode_start': on_episode_start,
+        },
+        'evaluation_interval': 10,
+        # 'evaluation_num_episodes': 1,
+        'evaluation_num_episodes': 1 if args.debug else (args.num_learners + 1) // 2,
+        'evaluation_config': {'multiagent': {'policy_mapping_fn': mcts_eval_policy_mapping_fn}},
+    }, **tune_config)
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--policy', type=str, default='PPO')
@@ -20,74 +124,60 @@ if __name__ == '__main__':
     parser.add_argument('--human', action='store_true')
     args = parser.parse_args()
 
-    ray.init(local_mode=args.debug)
+    # one BLAS/OpenMP thread per process; rollout workers already map 1:1
+    # onto cores, so library-level thread pools only oversubscribe them
+    os.environ.setdefault('OMP_NUM_THREADS', '1')
+    os.environ.setdefault('MKL_NUM_THREADS', '1')
+    os.environ.setdefault('OPENBLAS_NUM_THREADS', '1')
+    # outside debug runs, leave worker stdout in the per-worker log files
+    # rather than having the driver block forwarding 20 workers' output
+    ray.init(
+        local_mode=args.debug,
+        log_to_driver=args.debug,
+        logging_level='DEBUG' if args.debug else 'WARNING',
+    )
     tune_config = get_worker_config(args)
 
     model_config, env_cls = get_model_config(args.use_cnn)
-    register_env('c4', lambda cfg: env_cls(cfg))
-    env = env_cls()
-    obs_space, action_space = env.observation_space, env.action_space
+    ENV_CLS = env_cls
+    register_env('c4', c4_env_creator)
+    # every policy spec below references these two objects, so cloudpickle's
+    # memo table ships one copy of each space per worker rather than one per
+    # policy entry
+    obs_space, action_space = env_cls.get_spaces()
     trainable_policies = get_learner_policy_configs(args.num_learners, obs_space, action_space, model_config)
-    mcts_policies = get_mcts_policy_configs([8, 16, 32, 64, 128, 256, 512], obs_space, action_space)
-    mcts_train_policies = get_mcts_policy_configs([128], obs_space, action_space)
+    mcts_train_rollouts = [128]
     # mcts_eval_rollouts = [8, 16]
     mcts_eval_rollouts = [32, 64, 128]
-    mcts_eval_policies = get_mcts_policy_configs(mcts_eval_rollouts, obs_space, action_space)
-
-    def on_episode_start(info):
-        episode = info['episode']
-        episode.user_data['trainable_policies'] = [*trainable_policies]
-        episode.user_data['mcts_policies'] = [*mcts_eval_policies]
-
-    def name_trial(trial):
-        """Give trials a more readable name in terminal & Tensorboard."""
-        return f'{args.num_learners}x{trial.trainable_name}'
+    # build the MCTS policy specs once; the training and evaluation pools are
+    # subsets, so shared rollout sizes reuse one spec tuple instead of three
+    mcts_policies = get_mcts_policy_configs([8, 16, 32, 64, 128, 256, 512], obs_space, action_space)
+    mcts_train_policies = {f'mcts{i:04d}': mcts_policies[f'mcts{i:04d}'] for i in mcts_train_rollouts}
+    mcts_eval_policies = {f'mcts{i:04d}': mcts_policies[f'mcts{i:04d}'] for i in mcts_eval_rollouts}
+    # snapshot the policy names once, the module-level callbacks above fire
+    # on every episode/agent mapping so they shouldn't re-iterate the dicts
+    TRAINABLE_KEYS = tuple(trainable_policies)
+    MCTS_TRAIN_KEYS = tuple(mcts_train_policies)
+    MCTS_EVAL_KEYS = tuple(mcts_eval_policies)
+    TRIAL_PREFIX = f'{args.num_learners}x'
 
-    def mcts_opponent_policy_mapping_fn(info):
-        train_policies = [random.choice([*trainable_policies]), random.choice([*mcts_train_policies])]
-        random.shuffle(train_policies)
-        return train_policies
+    # merge the full policy set once, so rebuilding the tune config (e.g. in
+    # a sweep loop) reuses this dict instead of re-copying every spec tuple
+    policies = {
+        **trainable_policies,
+        **mcts_policies,
+        'human': (HumanPolicy, obs_space, action_space, {}),
+        'random': (RandomPolicy, obs_space, action_space, {}),
+    }
 
     tune.run(
         args.policy,
         name='trainer_evaluator',
         trial_name_creator=name_trial,
-        stop={
-            # 'timesteps_total': int(10e6),
-            # 'timesteps_total': int(100e6),
-            # 'timesteps_total': int(1e9),
-            # 'policy_reward_mean/learned00': 0.6
-            'policy_reward_mean/learned00': 0.0
-        },
-        config=dict({
-            'env': 'c4',
-            'env_config': {},
-            # 'lr': 0.001,
-            'lr': 5e-5,
-            # 'gamma': 0.995,
-            'gamma': 0.9,
-            'clip_param': 0.2,
-            'lambda': 0.95,
-            # 'kl_coeff': 1.0,
-            'entropy_coeff': 0.01,
-            'multiagent': {
-                'policies_to_train': [*trainable_policies],
-                # 'policy_mapping_fn': random_policy_mapping_fn if args.num_learners > 1 else lambda _: ('learned00', 'learned00'),
-                'policy_mapping_fn': mcts_opponent_policy_mapping_fn,
-                'policies': {
-                    **trainable_policies,
-                    **mcts_policies,
-                    'human': (HumanPolicy, obs_space, action_space, {}),
-                    'random': (RandomPolicy, obs_space, action_space, {}),
-                },
-            },
-            'callbacks': {
-                'on_episode_start': on_episode_start,
-            },
-            'evaluation_interval': 10,
-            # 'evaluation_num_episodes': 1,
-            'evaluation_num_episodes': 1 if args.debug else math.ceil(args.num_learners / 2),
-            'evaluation_config': {'multiagent': {'policy_mapping_fn': mcts_eval_policy_mapping_fn}},
-        }, **tune_config),
+        stop=STOP_CRITERIA,
+        config=build_config(args, tune_config, policies),
         checkpoint_at_end=True,
+        # keep trainer actors (and their built policy graphs) alive between
+        # trials instead of paying TF session startup per trial
+        reuse_actors=True,
     )